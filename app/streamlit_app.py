@@ -1,24 +1,44 @@
 """Minimal Streamlit app demonstrating the Hybrid RAG retrieval and generation.
 Run with: streamlit run app/streamlit_app.py
+The inference backend is taken from RAG_BACKEND (torch / int8 / onnx), see scripts/inference.py.
 """
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# scripts/ modules import each other by bare name (e.g. retrieve -> inference)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
 
 import streamlit as st
 import time
 from scripts.retrieve import Retriever
 from scripts.generate import generate_answer
 
+
+@st.cache_resource
+def get_retriever():
+    # cached across reruns; components keep loading in the background after the first render
+    return Retriever('indices')
+
+
 st.title('Hybrid RAG Demo')
-retriever = Retriever('indices')
+retriever = get_retriever()
 
 q = st.text_input('Enter your question')
+subset = st.selectbox('Search subset', ['all', 'fixed', 'random'])
+search_filters = None if subset == 'all' else {'subset': subset}
 if st.button('Run') and q:
     start = time.time()
-    dense = retriever.dense_search(q, top_k=50)
-    sparse = retriever.sparse_search(q, top_k=50)
-    fused = retriever.rrf_fuse(dense, sparse, rrf_k=60, top_n=10)
+    res = retriever.search(q, top_k=50, top_n=10, rrf_k=60, return_components=True, require_dense=False, filters=search_filters)
+    if res['timed_out']:
+        # a failed load is permanent; only an unfinished one is worth waiting for
+        failed = [f.exception() for f in (retriever._loading['model'], retriever._loading['index']) if f.done() and f.exception()]
+        if failed:
+            st.warning(f'Dense retrieval is unavailable ({failed[0]}); showing BM25 results only.')
+        elif not (retriever.is_ready('model') and retriever.is_ready('index')):
+            st.info('Dense model is still loading; showing BM25 results only.')
+        else:
+            st.warning('Dense search failed for this query; showing BM25 results only.')
+    dense, sparse, fused = res['dense'], res['sparse'], res['fused']
     answer = generate_answer(fused[:5], q)
     elapsed = time.time() - start
     st.subheader('Answer')
@@ -35,7 +35,7 @@ def main():
     try:
         run(f'python3 scripts/data_collection.py --fixed fixed_urls.json --out corpus.json --random 300', cwd=wd)
         run(f'python3 scripts/preprocess.py --in corpus.json --out chunks.json', cwd=wd)
-        build_idx_cmd = f'python3 scripts/build_index.py --chunks chunks.json --out_dir indices'
+        build_idx_cmd = f'python3 scripts/build_index.py --chunks chunks.json --out_dir indices --fixed fixed_urls.json'
         if args.max_chunks:
             build_idx_cmd += f' --max_chunks {args.max_chunks}'
         run(build_idx_cmd, cwd=wd)
@@ -0,0 +1,122 @@
+"""benchmark_backends.py
+Compare inference backends (see inference.py) on the query and generation path.
+For every backend, in a fresh process so memory numbers are not shared:
+- model load time and resident memory (RSS) after loading
+- single-query encoding latency (mean / p50 / p95) and batched encoding throughput
+- URL-level MRR / Recall@10 of hybrid retrieval on the questions
+- optionally (--generate) answer latency, semantic answer score and agreement with fp32 answers
+Deltas are reported against the 'torch' (fp32) backend.
+Usage: python scripts/benchmark_backends.py --indices indices --questions questions.json --out backend_report.json
+"""
+import argparse
+import json
+import multiprocessing
+import time
+import numpy as np
+from profiling import peak_rss_mb, rss_mb
+
+
+def _percentiles(values):
+    arr = np.asarray(values) * 1000.0
+    return {'mean_ms': float(arr.mean()), 'p50_ms': float(np.percentile(arr, 50)), 'p95_ms': float(np.percentile(arr, 95))}
+
+
+def bench_backend(backend, indices, qas, model_dir, generate, batch_size):
+    from inference import configure, load_embedder, load_generator
+    from retrieve import Retriever
+    from metrics import relevance_matrix, ranking_metrics, summarize, SemanticScorer
+    configure(backend=backend, model_dir=model_dir)
+    questions = [q['question'] for q in qas]
+    out = {'backend': backend, 'rss_start_mb': rss_mb()}
+
+    start = time.time()
+    load_embedder(backend)
+    out['embed_load_sec'] = time.time() - start
+    retriever = Retriever(indices, backend=backend)
+
+    retriever.model.encode(questions[:1], convert_to_numpy=True)  # warm-up
+    lat = []
+    for q in questions:
+        t = time.time()
+        retriever.model.encode([q], convert_to_numpy=True)
+        lat.append(time.time() - t)
+    out['encode_latency'] = _percentiles(lat)
+    t = time.time()
+    retriever.model.encode(questions, batch_size=batch_size, convert_to_numpy=True)
+    out['encode_throughput_qps'] = len(questions) / max(time.time() - t, 1e-9)
+
+    fused_lists = []
+    for q in questions:
+        fused_lists.append(retriever.search(q, top_k=50, top_n=20, rrf_k=60))
+    rel = relevance_matrix([q['url'] for q in qas], [[f.get('urls', [f['url']]) for f in fl] for fl in fused_lists], depth=20)
+    retrieval = summarize(ranking_metrics(rel, ks=(10,)))
+    out['mrr'] = retrieval['mrr']
+    out['recall@10'] = retrieval['recall@10']
+
+    if generate:
+        from generate import generate_answer
+        t = time.time()
+        load_generator(backend)
+        out['gen_load_sec'] = time.time() - t
+        answers, gen_lat = [], []
+        for q, fl in zip(questions, fused_lists):
+            t = time.time()
+            answers.append(generate_answer(fl[:5], q, backend=backend))
+            gen_lat.append(time.time() - t)
+        out['generate_latency'] = _percentiles(gen_lat)
+        sem = SemanticScorer().score(answers, [q.get('answer', '') for q in qas])
+        out['semantic_answer_score'] = float(np.mean(sem)) if len(sem) else None
+        out['answers'] = answers
+    out['rss_end_mb'] = rss_mb()
+    out['peak_rss_mb'] = peak_rss_mb()
+    return out
+
+
+if __name__ == '__main__':
+    from inference import BACKENDS
+    from metrics import token_f1
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--indices', default='indices')
+    parser.add_argument('--questions', default='questions.json')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--num_questions', type=int, default=100)
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--model_dir', default=None, help='Directory with locally stored models (default: RAG_MODEL_DIR or models)')
+    parser.add_argument('--generate', action='store_true', help='Also benchmark answer generation (slow)')
+    parser.add_argument('--out', default='backend_report.json')
+    args = parser.parse_args()
+
+    with open(args.questions) as f:
+        qas = json.load(f)[:args.num_questions]
+    backends = ['torch'] + [b for b in args.backends if b != 'torch']
+
+    ctx = multiprocessing.get_context('spawn')
+    results = {}
+    for b in backends:
+        print('Benchmarking backend', b)
+        try:
+            with ctx.Pool(1) as pool:
+                results[b] = pool.apply(bench_backend, (b, args.indices, qas, args.model_dir, args.generate, args.batch_size))
+        except Exception as e:
+            print('backend-error', b, e)
+            results[b] = {'backend': b, 'error': str(e)}
+
+    base = results.get('torch', {})
+    for b, r in results.items():
+        if 'error' in r or 'error' in base:
+            continue
+        r['mrr_delta_vs_fp32'] = r['mrr'] - base['mrr']
+        r['encode_speedup_vs_fp32'] = base['encode_latency']['mean_ms'] / r['encode_latency']['mean_ms']
+        if args.generate:
+            r['semantic_delta_vs_fp32'] = (r['semantic_answer_score'] or 0.0) - (base['semantic_answer_score'] or 0.0)
+            r['answer_agreement_f1_vs_fp32'] = float(np.mean([token_f1(a, ref) for a, ref in zip(r['answers'], base['answers'])]))
+
+    for b, r in results.items():
+        if 'error' in r:
+            print(f"{b:6s} error: {r['error']}")
+            continue
+        print(f"{b:6s} encode {r['encode_latency']['mean_ms']:.1f} ms  {r['encode_throughput_qps']:.1f} q/s  "
+              f"rss {r['rss_end_mb'] or 0:.0f} MB  MRR {r['mrr']:.4f} ({r.get('mrr_delta_vs_fp32', 0.0):+.4f})")
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print('Wrote backend report to', args.out)
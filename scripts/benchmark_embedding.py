@@ -0,0 +1,57 @@
+"""benchmark_embedding.py
+Chunks/sec of the index-build embedding stage (embed.py) for each worker count, against the
+original single-process model.encode(batch_size=...) call. Every run excludes pool start-up and model
+loading from chunks/sec (reported separately as startup_sec), and the report shows how much the
+model's max sequence length flattens the token lengths of this corpus.
+Usage: python scripts/benchmark_embedding.py --chunks chunks.json --workers 1 2 4 --sample 2000
+"""
+import argparse
+import json
+import time
+from embed import embed_texts, length_stats, token_lengths
+from inference import BACKENDS, configure, get_backend, load_embedder
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chunks', required=True)
+    parser.add_argument('--sample', type=int, default=2000, help='Embed only the first N chunks')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--token_budget', type=int, default=8192)
+    parser.add_argument('--batch_size', type=int, default=64)
+    parser.add_argument('--backend', choices=BACKENDS, default=None)
+    parser.add_argument('--model_dir', default=None)
+    parser.add_argument('--out', default='embedding_report.json')
+    args = parser.parse_args()
+
+    configure(backend=args.backend, model_dir=args.model_dir)
+    with open(args.chunks) as f:
+        texts = [c['text'] for c in json.load(f)[:args.sample]]
+
+    report = {'backend': get_backend(), 'chunks': len(texts), 'runs': []}
+    report['lengths'] = length_stats(token_lengths(texts))
+    lens = report['lengths']
+    print(f"token lengths p10/p50/p90 {lens['raw_tokens_p10']:.0f}/{lens['raw_tokens_p50']:.0f}/{lens['raw_tokens_p90']:.0f}, "
+          f"{lens['truncated_frac'] * 100:.1f}% truncated at {lens['max_seq_length']}")
+
+    start = time.time()
+    model = load_embedder()
+    model.encode(['warm-up'], convert_to_numpy=True)
+    startup = time.time() - start
+    start = time.time()
+    model.encode(texts, batch_size=args.batch_size, show_progress_bar=False, convert_to_numpy=True)
+    elapsed = time.time() - start
+    report['baseline'] = {'workers': 1, 'startup_sec': startup, 'embed_sec': elapsed, 'chunks_per_sec': len(texts) / elapsed}
+    print(f"baseline (model.encode, 1 process): {report['baseline']['chunks_per_sec']:.1f} chunks/sec")
+
+    for w in args.workers:
+        _, stats = embed_texts(texts, workers=w, token_budget=args.token_budget, max_batch_size=args.batch_size,
+                               model_dir=args.model_dir, show_progress_bar=False)
+        stats['speedup_vs_baseline'] = stats['chunks_per_sec'] / report['baseline']['chunks_per_sec']
+        report['runs'].append(stats)
+        print(f"workers={w}: {stats['chunks_per_sec']:.1f} chunks/sec ({stats['speedup_vs_baseline']:.2f}x), "
+              f"padding overhead {stats['padded_tokens'] / max(stats['real_tokens'], 1):.2f}x, "
+              f"start-up {stats['startup_sec']:.1f}s (excluded)")
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Wrote embedding report to', args.out)
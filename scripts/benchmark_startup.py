@@ -0,0 +1,91 @@
+"""benchmark_startup.py
+Cold-start profile of the query path, so startup regressions show up next to the backend benchmark.
+- import time of each scripts/ module, each measured in a fresh interpreter
+- heavy third-party modules (torch, transformers, faiss, ...) each module pulls in at import
+- Retriever startup: constructor return, first BM25-only query, dense side ready, first hybrid query
+Usage: python scripts/benchmark_startup.py --indices indices --out startup_report.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULES = ['metrics', 'dedup', 'inference', 'retrieve', 'generate', 'evaluate']
+HEAVY = ['torch', 'transformers', 'sentence_transformers', 'faiss', 'bert_score', 'optimum']
+
+_IMPORT_PROBE = '''
+import json, sys, time
+t = time.perf_counter()
+import {module}
+sec = time.perf_counter() - t
+print(json.dumps({{'import_sec': sec, 'heavy_loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+_RETRIEVER_PROBE = '''
+import json, time
+t0 = time.perf_counter()
+from retrieve import Retriever
+out = {{'import_sec': time.perf_counter() - t0}}
+t = time.perf_counter()
+r = Retriever({indices!r})
+out['construct_sec'] = time.perf_counter() - t
+r.sparse_search({query!r}, top_k=10)
+out['first_sparse_query_sec'] = time.perf_counter() - t
+r.model
+r.index
+out['dense_ready_sec'] = time.perf_counter() - t
+r.search({query!r}, top_k=50, top_n=10)
+out['first_hybrid_query_sec'] = time.perf_counter() - t
+out['total_sec'] = time.perf_counter() - t0
+print(json.dumps(out))
+'''
+
+
+def run_probe(code):
+    proc = subprocess.run([sys.executable, '-c', code], cwd=SCRIPTS_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--indices', default='indices')
+    parser.add_argument('--query', default='What is the main idea of natural language processing?')
+    parser.add_argument('--repeats', type=int, default=3, help='Fresh-interpreter runs per measurement (median reported)')
+    parser.add_argument('--out', default='startup_report.json')
+    args = parser.parse_args()
+
+    def median_probe(code):
+        runs = [run_probe(code) for _ in range(args.repeats)]
+        ok = [r for r in runs if 'error' not in r]
+        if not ok:
+            return runs[0]
+        result = dict(ok[0])
+        for key, val in ok[0].items():
+            if isinstance(val, float):
+                result[key] = sorted(r[key] for r in ok)[len(ok) // 2]
+        return result
+
+    report = {'python': sys.version.split()[0], 'imports': {}}
+    for m in MODULES:
+        report['imports'][m] = median_probe(_IMPORT_PROBE.format(module=m, heavy=HEAVY))
+        r = report['imports'][m]
+        if 'error' in r:
+            print(f"import {m:10s} error: {r['error']}")
+        else:
+            print(f"import {m:10s} {r['import_sec'] * 1000:8.1f} ms  heavy: {', '.join(r['heavy_loaded']) or '-'}")
+
+    if os.path.isdir(args.indices):
+        indices = os.path.abspath(args.indices)
+        report['retriever'] = median_probe(_RETRIEVER_PROBE.format(indices=indices, query=args.query))
+        for k, v in report['retriever'].items():
+            print(f"retriever {k:24s} {v:.3f}s" if isinstance(v, float) else f"retriever {k}: {v}")
+    else:
+        print('Index directory not found; skipping Retriever startup profile:', args.indices)
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Wrote startup report to', args.out)
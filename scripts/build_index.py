@@ -1,27 +1,41 @@
 """build_index.py
-Embeds chunks using sentence-transformers and builds a FAISS index. Also builds BM25 index (rank_bm25).
+Embeds chunks using sentence-transformers (length-sorted batches over a process pool, see embed.py) and builds a FAISS index. Also builds BM25 index (rank_bm25).
 Saves indices to specified output directory.
+Also precomputes metadata filter bitsets (url / title / subset, see filters.py) over chunk rows.
+Optionally collapses near-duplicate chunks first (see dedup.py) and writes build_stats.json
+with timings, index sizes and the estimated savings from deduplication.
 """
 import argparse
 import json
 import os
 import re
-from sentence_transformers import SentenceTransformer
+import time
 import numpy as np
 import faiss
 from rank_bm25 import BM25Okapi
 import joblib
+from dedup import dedup_chunks
+from filters import build_filters
+from embed import embed_texts
+from inference import BACKENDS, EMBED_MODEL, configure, get_backend
 
-MODEL_NAME = 'all-MiniLM-L6-v2'
+MODEL_NAME = EMBED_MODEL
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--chunks', required=True)
     parser.add_argument('--out_dir', default='indices')
-    parser.add_argument('--batch_size', type=int, default=64)
+    parser.add_argument('--batch_size', type=int, default=64, help='Maximum texts per embedding batch')
+    parser.add_argument('--token_budget', type=int, default=8192, help='Maximum padded tokens per embedding batch')
+    parser.add_argument('--workers', type=int, default=1, help='Embedding processes (each loads the model once)')
     parser.add_argument('--max_chunks', type=int, default=None, help='If set, embed only the first N chunks (useful for smoke tests)')
+    parser.add_argument('--backend', choices=BACKENDS, default=None, help='Inference backend (default: RAG_BACKEND or torch)')
+    parser.add_argument('--model_dir', default=None, help='Directory with locally stored models (default: RAG_MODEL_DIR or models)')
+    parser.add_argument('--fixed', default=None, help='fixed_urls.json, used to tag the fixed/random subset of chunks that lack a subset field')
+    parser.add_argument('--dedup_threshold', type=float, default=None, help='If set, merge chunks whose MinHash Jaccard estimate is above this value before indexing')
     args = parser.parse_args()
 
+    configure(backend=args.backend, model_dir=args.model_dir)
     os.makedirs(args.out_dir, exist_ok=True)
     with open(args.chunks, 'r') as f:
         chunks = json.load(f)
@@ -29,20 +43,30 @@ if __name__ == '__main__':
     if args.max_chunks is not None:
         chunks = chunks[:args.max_chunks]
 
+    build_start = time.time()
+    dedup_stats = None
+    if args.dedup_threshold is not None:
+        chunks, dedup_stats = dedup_chunks(chunks, threshold=args.dedup_threshold)
+        print(f"Dedup removed {dedup_stats['chunks_removed']} of {dedup_stats['chunks_in']} chunks")
+
     texts = [c['text'] for c in chunks]
     ids = [c['chunk_id'] for c in chunks]
 
-    print('Loading model', MODEL_NAME)
-    model = SentenceTransformer(MODEL_NAME)
-    # Embed
-    embeddings = model.encode(texts, batch_size=args.batch_size, show_progress_bar=True, convert_to_numpy=True)
+    print('Embedding with', MODEL_NAME, 'backend', get_backend(), 'workers', args.workers)
+    # Embed: length-sorted, token-budgeted batches spread over args.workers processes
+    embeddings, embed_stats = embed_texts(texts, workers=args.workers, token_budget=args.token_budget,
+                                          max_batch_size=args.batch_size, model_dir=args.model_dir)
+    embed_sec = embed_stats['embed_sec']
+    print(f"Embedded {len(texts)} chunks in {embed_sec:.1f}s ({embed_stats['chunks_per_sec']:.1f} chunks/sec, "
+          f"plus {embed_stats['startup_sec']:.1f}s worker start-up)")
     dim = embeddings.shape[1]
     # Build FAISS index (cosine similarity via inner product on normalized vectors)
     index = faiss.IndexFlatIP(dim)
     # normalize
     faiss.normalize_L2(embeddings)
     index.add(embeddings)
-    faiss.write_index(index, os.path.join(args.out_dir, 'faiss_index.index'))
+    faiss_path = os.path.join(args.out_dir, 'faiss_index.index')
+    faiss.write_index(index, faiss_path)
     # Save metadata mapping
     joblib.dump({'ids': ids, 'chunks': chunks}, os.path.join(args.out_dir, 'meta.joblib'))
 
@@ -57,5 +81,34 @@ if __name__ == '__main__':
 
     tokenized = [normalize(t).split() for t in texts]
     bm25 = BM25Okapi(tokenized)
-    joblib.dump(bm25, os.path.join(args.out_dir, 'bm25.joblib'))
+    bm25_path = os.path.join(args.out_dir, 'bm25.joblib')
+    joblib.dump(bm25, bm25_path)
+
+    fixed_urls = None
+    if args.fixed:
+        with open(args.fixed) as f:
+            data = json.load(f)
+        fixed_urls = data['fixed_urls'] if isinstance(data, dict) else data
+    bitsets = build_filters(chunks, fixed_urls=fixed_urls)
+    joblib.dump(bitsets, os.path.join(args.out_dir, 'filters.joblib'))
+
+    stats = {
+        'chunks_indexed': len(chunks),
+        'backend': get_backend(),
+        'embed_sec': embed_sec,
+        'embedding': embed_stats,
+        'build_sec': time.time() - build_start,
+        'faiss_bytes': os.path.getsize(faiss_path),
+        'bm25_bytes': os.path.getsize(bm25_path),
+        'dedup': dedup_stats,
+    }
+    if dedup_stats and len(chunks):
+        removed = dedup_stats['chunks_removed']
+        # flat index stores one float32 vector per chunk; embedding time scales with chunk count
+        stats['dedup']['faiss_bytes_saved'] = removed * dim * 4
+        stats['dedup']['embed_sec_saved_est'] = embed_sec / len(chunks) * removed
+        stats['dedup']['bm25_bytes_saved_est'] = int(stats['bm25_bytes'] / len(chunks) * removed)
+    with open(os.path.join(args.out_dir, 'build_stats.json'), 'w') as f:
+        json.dump(stats, f, indent=2)
+    print(json.dumps(stats, indent=2))
     print('Indices saved to', args.out_dir)
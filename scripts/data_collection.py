@@ -1,6 +1,6 @@
 """data_collection.py
 Fetch pages from Wikipedia given fixed URLs and sample random URLs for the random set.
-Saves raw HTML/text per URL into an output JSON file with fields: url, title, text
+Saves raw HTML/text per URL into an output JSON file with fields: url, title, text, subset ('fixed' or 'random')
 """
 import argparse
 import json
@@ -59,7 +59,7 @@ if __name__ == '__main__':
     for u in fixed_set:
         title, text = fetch_text_from_url(u)
         if text and len(text.split()) >= args.min_words:
-            results.append({'url': u, 'title': title, 'text': text})
+            results.append({'url': u, 'title': title, 'text': text, 'subset': 'fixed'})
             seen_urls.add(u)
         else:
             raise SystemExit(f"Fixed URL does not meet minimum word requirement or could not be fetched: {u}")
@@ -88,7 +88,7 @@ if __name__ == '__main__':
                 continue
             if url in seen_urls:
                 continue
-            results.append({'url': url, 'title': p.title, 'text': text})
+            results.append({'url': url, 'title': p.title, 'text': text, 'subset': 'random'})
             seen_urls.add(url)
             random_count += 1
             if random_count % 10 == 0 or random_count <= 5:
@@ -0,0 +1,205 @@
+"""dedup.py
+Near-duplicate chunk detection with MinHash signatures and LSH banding.
+Groups chunks whose Jaccard similarity (over word shingles) is at least a threshold, keeps one
+representative per group and records every source URL of the group on it:
+- representative['urls']: all URLs whose text is represented by this chunk
+- representative['duplicate_ids']: chunk_ids of the removed group members
+- representative['titles'] / ['subsets']: every title and fixed/random subset in the group, so metadata
+  filters (filters.py) match the representative by any merged page
+LSH banding is tuned for recall (see lsh_params); every candidate pair is then verified with its exact
+shingle Jaccard, so extra candidates only cost time.
+Usage: python scripts/dedup.py --chunks chunks.json --out chunks_dedup.json --threshold 0.8
+       python scripts/dedup.py --check --threshold 0.8   # merge rate of synthetic pairs just above the threshold
+"""
+import argparse
+import json
+import sys
+import time
+import zlib
+import numpy as np
+
+# Mersenne prime 2^31 - 1 keeps a*x + b inside int64 for 31-bit hashes
+_PRIME = (1 << 31) - 1
+
+
+def shingles(text, n=5):
+    words = text.lower().split()
+    if len(words) <= n:
+        grams = [' '.join(words)]
+    else:
+        grams = [' '.join(words[i:i + n]) for i in range(len(words) - n + 1)]
+    return np.unique(np.array([zlib.crc32(g.encode()) & _PRIME for g in grams], dtype=np.int64))
+
+
+def jaccard(a, b):
+    """Exact Jaccard similarity of two shingle arrays from shingles()."""
+    inter = len(np.intersect1d(a, b, assume_unique=True))
+    return inter / (len(a) + len(b) - inter)
+
+
+def minhash_signatures(shingle_sets, num_perm=128, seed=1):
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, _PRIME, size=(num_perm, 1)).astype(np.int64)
+    b = rng.randint(0, _PRIME, size=(num_perm, 1)).astype(np.int64)
+    sigs = np.empty((len(shingle_sets), num_perm), dtype=np.int64)
+    for i, sh in enumerate(shingle_sets):
+        sigs[i] = ((a * sh[None, :] + b) % _PRIME).min(axis=1)
+    return sigs
+
+
+def candidate_prob(similarity, bands, rows):
+    """Probability that a pair with the given Jaccard similarity shares at least one LSH band."""
+    return 1.0 - (1.0 - similarity ** rows) ** bands
+
+
+def lsh_params(threshold, num_perm, min_recall=0.98):
+    """(bands, rows) with the most rows per band (fewest spurious candidates) that still makes a pair at exactly
+    `threshold` a candidate with probability >= min_recall. bands = num_perm // rows, so a few permutations
+    may go unused. For threshold 0.8 and 128 permutations this is 18 bands x 7 rows (0.986 at J=0.8).
+    """
+    for rows in range(num_perm, 0, -1):
+        bands = num_perm // rows
+        if candidate_prob(threshold, bands, rows) >= min_recall:
+            return bands, rows
+    return num_perm, 1
+
+
+def find_groups(sigs, shingle_sets, threshold=0.8):
+    """Return a list of groups (lists of row indices, ascending); singletons included.
+    LSH candidates are merged when their exact shingle Jaccard is at least threshold.
+    """
+    n, num_perm = sigs.shape
+    bands, rows = lsh_params(threshold, num_perm)
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for band in range(bands):
+        buckets = {}
+        block = sigs[:, band * rows:(band + 1) * rows]
+        for i in range(n):
+            buckets.setdefault(block[i].tobytes(), []).append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            head = members[0]
+            for m in members[1:]:
+                ra, rb = find(head), find(m)
+                if ra == rb:
+                    continue
+                # verify the LSH candidate exactly; the signature estimate is too noisy near the threshold
+                if jaccard(shingle_sets[head], shingle_sets[m]) >= threshold:
+                    parent[max(ra, rb)] = min(ra, rb)
+
+    groups = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    return sorted(groups.values(), key=lambda g: g[0])
+
+
+def dedup_chunks(chunks, threshold=0.8, num_perm=128, shingle_size=5):
+    """Collapse near-duplicate chunks. Returns (representatives, stats).
+    The first chunk of each group (corpus order) is the representative.
+    """
+    start = time.time()
+    shingle_sets = [shingles(c['text'], shingle_size) for c in chunks]
+    sigs = minhash_signatures(shingle_sets, num_perm=num_perm)
+    groups = find_groups(sigs, shingle_sets, threshold=threshold)
+    bands, rows = lsh_params(threshold, num_perm)
+    reps = []
+    for g in groups:
+        rep = dict(chunks[g[0]])
+        urls, titles, subsets = [], [], []
+        dup_ids = list(rep.get('duplicate_ids', []))
+        for n, i in enumerate(g):
+            member = chunks[i]
+            for values, new in ((urls, member.get('urls', [member['url']])),
+                                (titles, member.get('titles', [member.get('title')])),
+                                (subsets, member.get('subsets', [member.get('subset')]))):
+                for v in new:
+                    if v and v not in values:
+                        values.append(v)
+            if n:
+                dup_ids.append(member['chunk_id'])
+                dup_ids.extend(member.get('duplicate_ids', []))
+        rep['urls'] = urls
+        rep['titles'] = titles
+        rep['subsets'] = subsets
+        rep['duplicate_ids'] = dup_ids
+        reps.append(rep)
+    stats = {
+        'chunks_in': len(chunks),
+        'chunks_out': len(reps),
+        'chunks_removed': len(chunks) - len(reps),
+        'duplicate_groups': sum(1 for g in groups if len(g) > 1),
+        'threshold': threshold,
+        'num_perm': num_perm,
+        'lsh_bands': bands,
+        'lsh_rows': rows,
+        'dedup_sec': time.time() - start,
+    }
+    return reps, stats
+
+
+def check_recall(threshold=0.8, pairs=200, words=300, margin=0.03, num_perm=128, shingle_size=5, seed=0):
+    """Merge rate of synthetic near-duplicate pairs whose exact shingle Jaccard lies in (threshold, threshold + margin]."""
+    rng = np.random.RandomState(seed)
+    chunks, sims = [], []
+    for p in range(pairs):
+        base = [f'w{p}_{i}' for i in range(words)]
+        # replace spread-out words one at a time until the pair would drop to the threshold
+        positions = rng.permutation(words)
+        best = None
+        for k in range(1, words):
+            dup = list(base)
+            for j in positions[:k]:
+                dup[j] = f'x{p}_{j}'
+            sim = jaccard(shingles(' '.join(base), shingle_size), shingles(' '.join(dup), shingle_size))
+            if sim <= threshold:
+                break
+            best = (dup, sim)
+        if best is None or best[1] > threshold + margin:
+            continue
+        sims.append(best[1])
+        for side, text in (('a', base), ('b', best[0])):
+            chunks.append({'chunk_id': f'p{p}{side}', 'url': f'p{p}{side}', 'text': ' '.join(text)})
+    reps, _ = dedup_chunks(chunks, threshold=threshold, num_perm=num_perm, shingle_size=shingle_size)
+    merged = len(chunks) - len(reps)
+    return {
+        'threshold': threshold,
+        'pairs': len(sims),
+        'jaccard_min': min(sims) if sims else None,
+        'jaccard_max': max(sims) if sims else None,
+        'merged': merged,
+        'merge_rate': merged / len(sims) if sims else None,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chunks')
+    parser.add_argument('--out', default='chunks_dedup.json')
+    parser.add_argument('--threshold', type=float, default=0.8, help='Estimated Jaccard similarity above which chunks are merged')
+    parser.add_argument('--num_perm', type=int, default=128)
+    parser.add_argument('--shingle_size', type=int, default=5)
+    parser.add_argument('--check', action='store_true', help='Instead of deduplicating, report the merge rate of synthetic pairs just above --threshold; exits non-zero below 95%%')
+    args = parser.parse_args()
+
+    if args.check:
+        result = check_recall(args.threshold, num_perm=args.num_perm, shingle_size=args.shingle_size)
+        print(json.dumps(result, indent=2))
+        sys.exit(0 if result['merge_rate'] >= 0.95 else 1)
+    if not args.chunks:
+        parser.error('--chunks is required unless --check is given')
+
+    with open(args.chunks) as f:
+        chunks = json.load(f)
+    reps, stats = dedup_chunks(chunks, threshold=args.threshold, num_perm=args.num_perm, shingle_size=args.shingle_size)
+    with open(args.out, 'w') as f:
+        json.dump(reps, f)
+    print(json.dumps(stats, indent=2))
+    print(f"Wrote {len(reps)} chunks to {args.out}")
@@ -0,0 +1,157 @@
+"""embed.py
+Length-sorted, multi-process embedding for index builds.
+- token_lengths(texts): tokenizer lengths (uncapped; the model truncates at MAX_SEQ_LENGTH)
+- make_batches(lengths, token_budget, max_batch_size): batches of similar-length texts whose padded size
+  (batch size x longest text) stays within token_budget
+- embed_texts(texts, workers, ...): encodes the batches on a process pool (each worker loads the model once)
+  and returns vectors in the original row order, plus stats. Pool start-up and model loading are timed
+  separately ('startup_sec') from encoding ('embed_sec', 'chunks_per_sec'), so worker counts compare fairly.
+"""
+import os
+import time
+import numpy as np
+from inference import EMBED_MODEL, configure, get_backend, load_embedder, model_path
+
+MAX_SEQ_LENGTH = 256
+
+# per-worker model (or its loading error), set once by _init_worker
+_WORKER_MODEL = None
+_WORKER_ERROR = None
+
+
+def token_lengths(texts, name=EMBED_MODEL):
+    try:
+        from transformers import AutoTokenizer
+        src = model_path(name)
+        tokenizer = AutoTokenizer.from_pretrained('sentence-transformers/' + name if src == name else src)
+        lengths = [len(ids) for ids in tokenizer(texts, add_special_tokens=True, truncation=False)['input_ids']]
+    except Exception as e:
+        # word count is a close proxy for sorting when no tokenizer is available
+        print('tokenizer-unavailable, using word counts:', e)
+        lengths = [len(t.split()) + 2 for t in texts]
+    return np.asarray(lengths, dtype=np.int64)
+
+
+def length_stats(raw_lengths, max_seq_length=MAX_SEQ_LENGTH):
+    """How much truncation at max_seq_length flattens the length distribution that sorting relies on."""
+    if not len(raw_lengths):
+        return {}
+    capped = np.minimum(raw_lengths, max_seq_length)
+    return {
+        'max_seq_length': max_seq_length,
+        'raw_tokens_p10': float(np.percentile(raw_lengths, 10)),
+        'raw_tokens_p50': float(np.percentile(raw_lengths, 50)),
+        'raw_tokens_p90': float(np.percentile(raw_lengths, 90)),
+        'truncated_frac': float(np.mean(raw_lengths > max_seq_length)),
+        'capped_tokens_mean': float(capped.mean()),
+        'raw_tokens_mean': float(raw_lengths.mean()),
+    }
+
+
+def make_batches(lengths, token_budget=8192, max_batch_size=256):
+    """Row-index batches, longest texts first; each batch's padded token count stays within token_budget."""
+    order = np.argsort(-np.asarray(lengths), kind='stable')
+    batches = []
+    current = []
+    longest = 0
+    for idx in order:
+        longest_if_added = max(longest, int(lengths[idx]))
+        if current and (len(current) + 1 > max_batch_size or (len(current) + 1) * longest_if_added > token_budget):
+            batches.append(current)
+            current = []
+            longest_if_added = int(lengths[idx])
+        current.append(int(idx))
+        longest = longest_if_added
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _init_worker(backend, model_dir, torch_threads, ready):
+    global _WORKER_MODEL, _WORKER_ERROR
+    try:
+        if torch_threads:
+            try:
+                import torch
+                torch.set_num_threads(torch_threads)
+            except ImportError:
+                pass
+        configure(backend=backend, model_dir=model_dir)
+        _WORKER_MODEL = load_embedder(backend)
+        # warm-up encode so start-up is excluded from the encoding time
+        _WORKER_MODEL.encode(['warm-up'], convert_to_numpy=True)
+    except Exception as e:
+        # raised from the first batch instead, so the pool does not respawn this worker forever
+        _WORKER_ERROR = e
+    finally:
+        ready.release()
+
+
+def _encode_batch(task):
+    if _WORKER_ERROR is not None:
+        raise _WORKER_ERROR
+    rows, texts = task
+    return rows, _WORKER_MODEL.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+
+
+def embed_texts(texts, workers=1, token_budget=8192, max_batch_size=256, backend=None, model_dir=None, show_progress_bar=True):
+    """Embed texts (length-sorted, token-budgeted batches) on `workers` processes. Returns (embeddings, stats)."""
+    from tqdm import tqdm
+    backend = backend or get_backend()
+    t = time.time()
+    raw_lengths = token_lengths(texts)
+    lengths = np.minimum(raw_lengths, MAX_SEQ_LENGTH)
+    batches = make_batches(lengths, token_budget=token_budget, max_batch_size=max_batch_size)
+    sort_sec = time.time() - t
+    out = None
+    progress = tqdm(total=len(texts), disable=not show_progress_bar)
+
+    def place(rows, vecs):
+        nonlocal out
+        if out is None:
+            out = np.empty((len(texts), vecs.shape[1]), dtype=np.float32)
+        out[rows] = vecs
+        progress.update(len(rows))
+
+    t = time.time()
+    if workers <= 1:
+        model = load_embedder(backend)
+        model.encode(['warm-up'], convert_to_numpy=True)
+        startup_sec = time.time() - t
+        t = time.time()
+        for rows in batches:
+            place(rows, model.encode([texts[i] for i in rows], batch_size=len(rows), convert_to_numpy=True))
+        embed_sec = time.time() - t
+    else:
+        import multiprocessing
+        # split the cores between workers so their torch thread pools do not oversubscribe
+        torch_threads = max(1, (os.cpu_count() or workers) // workers)
+        ctx = multiprocessing.get_context('spawn')
+        # every worker releases once after loading its model; the parent waits for all of them
+        ready = ctx.Semaphore(0)
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(backend, model_dir, torch_threads, ready)) as pool:
+            for _ in range(workers):
+                ready.acquire()
+            startup_sec = time.time() - t
+            t = time.time()
+            tasks = ((rows, [texts[i] for i in rows]) for rows in batches)
+            for rows, vecs in pool.imap_unordered(_encode_batch, tasks):
+                place(rows, vecs)
+            embed_sec = time.time() - t
+    progress.close()
+    stats = {
+        'workers': workers,
+        'chunks': len(texts),
+        'batches': len(batches),
+        'token_budget': token_budget,
+        'padded_tokens': int(sum(len(b) * lengths[b[0]] for b in batches)),
+        'real_tokens': int(lengths.sum()),
+        'lengths': length_stats(raw_lengths),
+        'sort_sec': sort_sec,
+        'startup_sec': startup_sec,
+        'embed_sec': embed_sec,
+        'chunks_per_sec': len(texts) / embed_sec if embed_sec > 0 else 0.0,
+    }
+    if out is None:
+        out = np.zeros((0, 0), dtype=np.float32)
+    return out, stats
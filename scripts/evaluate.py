@@ -3,49 +3,23 @@ Evaluation pipeline:
 - Load questions (or generate if not provided)
 - Run retriever+generator to get answers and retrieved URLs
 - Compute MRR at URL level
-- Compute Precision@K, NDCG@K and average response latency as additional metrics
+- Compute Precision@K, Recall@K, NDCG@K (vectorized, see metrics.py) and average response latency as additional metrics
 - Compute semantic answer similarity (BERTScore if available, else token-F1)
 - Produce JSON report and an HTML report with plots
 """
 import argparse
+import importlib.util
 import json
 import time
 import csv
 import os
 import numpy as np
 from retrieve import Retriever
-from generate import generate_answer
+from inference import BACKENDS, configure
+from metrics import DEFAULT_KS, relevance_matrix, ranking_metrics, summarize, SemanticScorer
 
-# We'll implement MRR (URL level), Precision@K, and use bert-score if installed
-try:
-    from bert_score import score as bert_score
-    BERTSCORE_AVAILABLE = True
-except Exception:
-    BERTSCORE_AVAILABLE = False
-
-def compute_mrr(ground_url, ranked_urls):
-    # ranked_urls: list of urls in order
-    for i, u in enumerate(ranked_urls, start=1):
-        if u == ground_url:
-            return 1.0 / i
-    return 0.0
-
-def compute_ndcg(ground_url, ranked_urls, k=10):
-    """Compute NDCG@k where relevance is binary (1 if url == ground, else 0).
-    DCG = sum_{i=1..k} (2^{rel_i} - 1) / log2(i+1)
-    IDCG for a single relevant document = 1 (at rank 1) -> IDCG = 1
-    So NDCG reduces to DCG in binary relevance case.
-    """
-    dcg = 0.0
-    for i, u in enumerate(ranked_urls[:k], start=1):
-        rel = 1 if u == ground_url else 0
-        dcg += (2**rel - 1) / np.log2(i + 1)
-    # IDCG is 1.0 if there is at least one relevant doc (which by construction there is)
-    idcg = 1.0
-    return dcg / idcg if idcg > 0 else 0.0
-
-def precision_at_k(ground_url, ranked_urls, k=10):
-    return 1.0 if ground_url in ranked_urls[:k] else 0.0
+# checked without importing: bert_score pulls in torch/transformers, which retrieval-only runs never need
+BERTSCORE_AVAILABLE = importlib.util.find_spec('bert_score') is not None
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -54,104 +28,92 @@ if __name__ == '__main__':
     parser.add_argument('--questions_in', default=None)
     parser.add_argument('--questions_out', default='questions_generated.json')
     parser.add_argument('--report_out', default='report.json')
+    parser.add_argument('--depth', type=int, default=20, help='Number of fused results kept per question for ranking metrics')
+    parser.add_argument('--ks', type=int, nargs='+', default=list(DEFAULT_KS), help='Cutoffs for Precision/Recall/NDCG@k')
+    parser.add_argument('--semantic_batch_size', type=int, default=64)
+    parser.add_argument('--semantic_device', default=None, help='Device for BERTScore (e.g. cpu, cuda); default auto')
+    parser.add_argument('--retrieval_only', action='store_true', help='Skip answer generation and semantic scoring (no transformers import)')
+    parser.add_argument('--backend', choices=BACKENDS, default=None, help='Inference backend (default: RAG_BACKEND or torch)')
+    parser.add_argument('--model_dir', default=None, help='Directory with locally stored models (default: RAG_MODEL_DIR or models)')
     args = parser.parse_args()
 
+    configure(backend=args.backend, model_dir=args.model_dir)
     retriever = Retriever(args.indices)
 
     if args.questions_in and os.path.exists(args.questions_in):
         with open(args.questions_in) as f:
             qas = json.load(f)
     else:
-        # call generator script
-        from generate_questions import MODEL as _m
-        from generate_questions import split_into_sentences
         # fallback minimal: generate blanks
         print('No questions provided; please run generate_questions.py to produce questions first.')
         qas = []
 
+    if not args.retrieval_only:
+        from generate import generate_answer
+
     results = []
-    mrrs = []
-    precs = []
-    all_gen_texts = []
     for q in qas:
         question = q['question']
         ground = q['url']
         start = time.time()
-        dense = retriever.dense_search(question, top_k=50)
-        sparse = retriever.sparse_search(question, top_k=50)
-        fused = retriever.rrf_fuse(dense, sparse, rrf_k=60, top_n=20)
+        fused = retriever.search(question, top_k=50, top_n=args.depth, rrf_k=60)
         ranked_urls = [f['url'] for f in fused]
-        # compute metrics
-        mrr = compute_mrr(ground, ranked_urls)
-        prec = precision_at_k(ground, ranked_urls, k=10)
-        mrrs.append(mrr)
-        precs.append(prec)
+        ranked_url_sets = [f.get('urls', [f['url']]) for f in fused]
         # generate answer from top-N fused chunks
-        try:
-            gen_answer = generate_answer(fused[:5], question)
-        except Exception as e:
-            print('generation-error', e)
-            gen_answer = ''
-        results.append({'question': question, 'ground_url': ground, 'ranked_urls': ranked_urls, 'mrr': mrr, 'precision@10': prec, 'answer': gen_answer})
-    # Additional metric: semantic similarity of generated answer to ground-truth answer using BERTScore if available
+        gen_answer = ''
+        if not args.retrieval_only:
+            try:
+                gen_answer = generate_answer(fused[:5], question)
+            except Exception as e:
+                print('generation-error', e)
+        latency = time.time() - start
+        results.append({'question': question, 'ground_url': ground, 'ranked_urls': ranked_urls, 'ranked_url_sets': ranked_url_sets, 'answer': gen_answer, 'latency': latency})
+
+    # Retrieval metrics: one questions x ranks relevance matrix, all k at once
+    ks = sorted(set(args.ks) | {10})
+    rel = relevance_matrix([r['ground_url'] for r in results], [r['ranked_url_sets'] for r in results], depth=args.depth)
+    per_q = ranking_metrics(rel, ks=ks)
+    for i, r in enumerate(results):
+        for name, vals in per_q.items():
+            r[name] = float(vals[i])
+    retrieval = summarize(per_q)
+
+    # Additional metric: semantic similarity of generated answer to ground-truth answer
+    # (BERTScore F1 if available, else token-F1)
+    scorer = SemanticScorer(batch_size=args.semantic_batch_size, device=args.semantic_device, use_bertscore=BERTSCORE_AVAILABLE)
     bert_f1_mean = None
-    if BERTSCORE_AVAILABLE and qas:
-        try:
-            preds = [r['answer'] for r in results]
-            refs = [q.get('answer','') for q in qas]
-            P, R, F1 = bert_score(preds, refs, lang='en', rescale_with_baseline=True)
-            bert_f1_mean = float(F1.mean())
-        except Exception as e:
-            print('bert-score-error', e)
-            bert_f1_mean = None
-    else:
-        # fallback: token-level F1 between generated answer and reference answer
-        def token_f1(a, b):
-            atok = a.lower().split()
-            btok = b.lower().split()
-            if not atok or not btok:
-                return 0.0
-            common = 0
-            bcounts = {}
-            for t in btok:
-                bcounts[t] = bcounts.get(t,0) + 1
-            for t in atok:
-                if bcounts.get(t,0) > 0:
-                    common += 1
-                    bcounts[t] -= 1
-            prec = common / len(atok)
-            rec = common / len(btok)
-            if prec+rec == 0:
-                return 0.0
-            return 2*prec*rec/(prec+rec)
-
-        if qas:
-            f1s = []
-            for r,q in zip(results, qas):
-                f1s.append(token_f1(r.get('answer',''), q.get('answer','')))
-            bert_f1_mean = float(np.mean(f1s)) if f1s else None
+    if not args.retrieval_only:
+        sem_scores = scorer.score([r['answer'] for r in results], [q.get('answer', '') for q in qas])
+        for r, s in zip(results, sem_scores):
+            r['semantic_score'] = float(s)
+        bert_f1_mean = float(np.mean(sem_scores)) if len(sem_scores) else None
+    mrrs = per_q['mrr']
+    latencies = [r['latency'] for r in results]
 
     out = {
-        'mrr_mean': float(np.mean(mrrs)) if mrrs else 0.0,
-        'precision10_mean': float(np.mean(precs)) if precs else 0.0,
+        'mrr_mean': retrieval['mrr'],
+        # precision10_mean and ndcg10_mean keep their original definitions so reports stay comparable
+        # across releases; the chunk-level precision and ideal-normalised NDCG get their own keys
+        'precision10_mean': retrieval['recall@10'],
+        'recall10_mean': retrieval['recall@10'],
+        'ndcg10_mean': retrieval['dcg@10'],
+        'chunk_precision10_mean': retrieval['precision@10'],
+        'ndcg10_ideal_mean': retrieval['ndcg@10'],
+        'retrieval_metrics': retrieval,
         'semantic_answer_score_mean': bert_f1_mean,
+        'semantic_method': scorer.method,
+        'avg_latency_sec': float(np.mean(latencies)) if latencies else 0.0,
         'per_question': results,
         'metrics_info': {
             'MRR_url_level': 'Mean Reciprocal Rank at URL level. For each question, rank position r of first correct URL. MRR = (1/Q) * sum_{i=1..Q} (1/r_i).',
-            'Precision@10': 'Fraction of questions where ground-truth URL appears in top-10 retrieved URLs: Precision@10 = (1/Q) * sum_{i} 1[ground in top10].',
+            'Precision@10': 'Fraction of questions where ground-truth URL appears in top-10 retrieved URLs: Precision@10 = (1/Q) * sum_{i} 1[ground in top10]. Same value as Recall@10.',
+            'Recall@K': 'Fraction of questions where ground-truth URL appears in top-K retrieved URLs: Recall@K = (1/Q) * sum_{i} 1[ground in topK].',
+            'ChunkPrecision@K': 'Fraction of the top-K retrieved chunks whose URL is the ground-truth URL, averaged over questions (retrieval_metrics precision@K).',
+            'NDCG@10': 'Binary-relevance DCG@10 = sum_{i=1..10} (2^{rel_i} - 1) / log2(i+1) with IDCG = 1 (single relevant URL).',
+            'NDCG@K (ideal)': 'The same DCG@K normalised by the ideal DCG@K of the same ranking (retrieval_metrics ndcg@K, ndcg10_ideal_mean).',
             'SemanticAnswerMetric': 'If BERTScore is available, mean BERTScore F1 between generated answer and reference answer; otherwise token-level F1 (precision/recall harmonic mean).'
         }
     }
-    # Additional evaluation: compute NDCG@10 and average latency
-    ndcgs = []
-    latencies = []
-    for r in results:
-        ranked = r.get('ranked_urls', [])
-        ndcgs.append(compute_ndcg(r.get('ground_url',''), ranked, k=10))
-        latencies.append(r.get('latency', 0.0))
-
-    out['ndcg10_mean'] = float(np.mean(ndcgs)) if ndcgs else 0.0
-    out['avg_latency_sec'] = float(np.mean(latencies)) if latencies else 0.0
 
     # write HTML report with simple plots
     try:
@@ -174,15 +136,11 @@ if __name__ == '__main__':
 
         # Semantic score histogram
         if bert_f1_mean is not None:
-            sems = []
-            for r,q in zip(results, qas):
-                if r.get('answer') and q.get('answer'):
-                    # reuse token_f1 if BERT not available
-                    sems.append(r.get('answer'))
-            # produce a placeholder plot using the semantic mean
             plt.figure()
-            plt.text(0.1,0.5,f"Semantic metric mean: {bert_f1_mean:.4f}", fontsize=14)
-            plt.axis('off')
+            plt.hist(sem_scores, bins=20, color='C1')
+            plt.title(f'Semantic answer score distribution ({scorer.method})')
+            plt.xlabel('Score per question')
+            plt.ylabel('Count')
             plt.savefig(png2)
             plt.close()
 
@@ -201,7 +159,10 @@ if __name__ == '__main__':
         html.append(f'<h1>Hybrid RAG Evaluation</h1>')
         html.append(f'<p>MRR (URL-level): {out["mrr_mean"]:.4f}</p>')
         html.append(f'<p>Precision@10: {out["precision10_mean"]:.4f}</p>')
+        html.append(f'<p>Recall@10: {out["recall10_mean"]:.4f}</p>')
         html.append(f'<p>NDCG@10: {out["ndcg10_mean"]:.4f}</p>')
+        html.append(f'<p>Chunk precision@10: {out["chunk_precision10_mean"]:.4f}</p>')
+        html.append(f'<p>NDCG@10 (ideal-normalised): {out["ndcg10_ideal_mean"]:.4f}</p>')
         html.append(f'<p>Avg latency (s): {out["avg_latency_sec"]:.3f}</p>')
         html.append('<h2>Metric details</h2>')
         for k,v in out.get('metrics_info', {}).items():
@@ -0,0 +1,64 @@
+"""filters.py
+Metadata filter bitsets over chunk rows, built once at index time and applied inside search.
+- build_filters(chunks, fixed_urls): {'n': rows, 'url': {...}, 'title': {...}, 'subset': {...}} where every
+  value is a packed bitset (np.packbits, little bit order: row i is bit i % 8 of byte i // 8), the layout
+  faiss.IDSelectorBitmap expects
+- combine(bitsets, filters): packed bitset of rows matching filters, e.g.
+  {'url': [...], 'title': 'Python (programming language)', 'subset': 'fixed'};
+  values within a field are OR-ed, fields are AND-ed
+"""
+import numpy as np
+
+FIELDS = ('url', 'title', 'subset')
+
+
+def _pack(mask):
+    return np.packbits(mask, bitorder='little')
+
+
+def unpack(bits, n):
+    return np.unpackbits(bits, count=n, bitorder='little').astype(bool)
+
+
+def build_filters(chunks, fixed_urls=None):
+    n = len(chunks)
+    rows = {f: {} for f in FIELDS}
+    fixed_urls = set(fixed_urls or [])
+    for i, c in enumerate(chunks):
+        # deduplicated chunks carry every URL, title and subset of their group
+        urls = c.get('urls', [c['url']])
+        titles = c.get('titles', [c.get('title')])
+        subsets = [s for s in c.get('subsets', [c.get('subset')]) if s]
+        if not subsets and fixed_urls:
+            subsets = sorted({'fixed' if u in fixed_urls else 'random' for u in urls})
+        for field, values in (('url', urls), ('title', titles), ('subset', subsets)):
+            for v in values:
+                if v:
+                    rows[field].setdefault(v, []).append(i)
+    out = {'n': n}
+    for field, values in rows.items():
+        out[field] = {}
+        for value, idx in values.items():
+            mask = np.zeros(n, dtype=bool)
+            mask[idx] = True
+            out[field][value] = _pack(mask)
+    return out
+
+
+def combine(bitsets, filters):
+    """Packed bitset of rows matching every given field, or None when filters is empty."""
+    if not filters:
+        return None
+    result = None
+    for field, values in filters.items():
+        if field not in FIELDS:
+            raise ValueError(f'Unknown filter field {field!r}; expected one of {FIELDS}')
+        if isinstance(values, str):
+            values = [values]
+        field_bits = np.zeros((bitsets['n'] + 7) // 8, dtype=np.uint8)
+        for v in values:
+            bits = bitsets[field].get(v)
+            if bits is not None:
+                field_bits |= bits
+        result = field_bits if result is None else result & field_bits
+    return result
@@ -1,16 +1,16 @@
 """generate.py
 Helper to generate an answer from retrieved context using a seq2seq model (e.g., flan-t5-base).
+The model is loaded once through inference.py, using the configured backend (torch / int8 / onnx).
 """
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from inference import GEN_MODEL, load_generator
 
-MODEL = 'google/flan-t5-base'
+MODEL = GEN_MODEL
 
-def generate_answer(context_chunks, question, max_input_tokens=1024, max_answer_tokens=256):
+def generate_answer(context_chunks, question, max_input_tokens=1024, max_answer_tokens=256, backend=None):
     # concatenate top-N chunks with separators
     text = '\n\n'.join([c['text'] for c in context_chunks])
     prompt = f"Context: {text}\n\nQuestion: {question}\nAnswer:"
-    tokenizer = AutoTokenizer.from_pretrained(MODEL)
-    model = AutoModelForSeq2SeqLM.from_pretrained(MODEL)
+    tokenizer, model = load_generator(backend, MODEL)
     inputs = tokenizer(prompt, return_tensors='pt', truncation=True, max_length=max_input_tokens)
     outputs = model.generate(**inputs, max_length=max_answer_tokens)
     answer = tokenizer.decode(outputs[0], skip_special_tokens=True)
@@ -0,0 +1,179 @@
+"""inference.py
+Shared CPU inference backends for the embedding model (all-MiniLM-L6-v2) and the generator (flan-t5-base).
+Backends:
+- 'torch' : stock PyTorch fp32 (default)
+- 'int8'  : PyTorch dynamic int8 quantization of every nn.Linear
+- 'onnx'  : ONNX Runtime via optimum (exported once and cached under the model directory)
+The backend and model directory are configured once, either with configure() or with the
+RAG_BACKEND / RAG_MODEL_DIR environment variables, and are shared by build_index.py,
+retrieve.py, generate.py and the Streamlit app. Models found under the model directory are
+loaded from disk, so everything works offline once `python scripts/inference.py --download` has run.
+"""
+import argparse
+import os
+import threading
+
+EMBED_MODEL = 'all-MiniLM-L6-v2'
+GEN_MODEL = 'google/flan-t5-base'
+BACKENDS = ('torch', 'int8', 'onnx')
+
+_CONFIG = {
+    'backend': os.environ.get('RAG_BACKEND', 'torch'),
+    'model_dir': os.environ.get('RAG_MODEL_DIR', 'models'),
+}
+# loaded models keyed by (kind, backend, model name)
+_CACHE = {}
+# one lock per cache key, so concurrent first callers load a model once and different models load in parallel
+_LOCKS = {}
+_LOCKS_GUARD = threading.Lock()
+
+
+def configure(backend=None, model_dir=None):
+    if backend is not None:
+        if backend not in BACKENDS:
+            raise ValueError(f'Unknown backend {backend!r}; expected one of {BACKENDS}')
+        _CONFIG['backend'] = backend
+    if model_dir is not None:
+        _CONFIG['model_dir'] = model_dir
+    return dict(_CONFIG)
+
+
+def get_backend():
+    return _CONFIG['backend']
+
+
+def local_path(name, suffix=''):
+    return os.path.join(_CONFIG['model_dir'], name.replace('/', '__') + suffix)
+
+
+def model_path(name):
+    """Local copy of a model if one exists under the model directory, else the hub name."""
+    path = local_path(name)
+    return path if os.path.isdir(path) else name
+
+
+def _quantize_int8(model):
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxEmbedder:
+    """Minimal SentenceTransformer-compatible encode() over an ONNX Runtime feature extractor.
+    Applies the mean pooling and L2 normalisation used by all-MiniLM-L6-v2.
+    """
+
+    def __init__(self, name):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+        onnx_dir = local_path(name, '__onnx')
+        if os.path.isdir(onnx_dir):
+            self.model = ORTModelForFeatureExtraction.from_pretrained(onnx_dir)
+            self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        else:
+            src = model_path(name)
+            if src == name:
+                src = 'sentence-transformers/' + name
+            self.model = ORTModelForFeatureExtraction.from_pretrained(src, export=True)
+            self.tokenizer = AutoTokenizer.from_pretrained(src)
+            self.model.save_pretrained(onnx_dir)
+            self.tokenizer.save_pretrained(onnx_dir)
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, convert_to_numpy=True, **kwargs):
+        import numpy as np
+        out = []
+        for start in range(0, len(texts), batch_size):
+            enc = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True, max_length=256, return_tensors='np')
+            hidden = self.model(**enc).last_hidden_state
+            hidden = hidden.numpy() if hasattr(hidden, 'numpy') else np.asarray(hidden)
+            mask = enc['attention_mask'][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            out.append(pooled.astype(np.float32))
+        if not out:
+            return np.zeros((0, self.model.config.hidden_size), dtype=np.float32)
+        return np.concatenate(out)
+
+
+def _cached(key, build, *args):
+    if key in _CACHE:
+        return _CACHE[key]
+    with _LOCKS_GUARD:
+        lock = _LOCKS.setdefault(key, threading.Lock())
+    with lock:
+        # another thread may have finished loading while this one waited
+        if key not in _CACHE:
+            _CACHE[key] = build(*args)
+    return _CACHE[key]
+
+
+def _build_embedder(backend, name):
+    if backend == 'onnx':
+        return OnnxEmbedder(name)
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_path(name), device='cpu')
+    if backend == 'int8':
+        model = _quantize_int8(model)
+    return model
+
+
+def _build_generator(backend, name):
+    from transformers import AutoTokenizer
+    if backend == 'onnx':
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        onnx_dir = local_path(name, '__onnx')
+        if os.path.isdir(onnx_dir):
+            model = ORTModelForSeq2SeqLM.from_pretrained(onnx_dir)
+            tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        else:
+            src = model_path(name)
+            model = ORTModelForSeq2SeqLM.from_pretrained(src, export=True)
+            tokenizer = AutoTokenizer.from_pretrained(src)
+            model.save_pretrained(onnx_dir)
+            tokenizer.save_pretrained(onnx_dir)
+    else:
+        from transformers import AutoModelForSeq2SeqLM
+        src = model_path(name)
+        tokenizer = AutoTokenizer.from_pretrained(src)
+        model = AutoModelForSeq2SeqLM.from_pretrained(src).eval()
+        if backend == 'int8':
+            model = _quantize_int8(model)
+    return tokenizer, model
+
+
+def load_embedder(backend=None, name=EMBED_MODEL):
+    """Embedding model exposing SentenceTransformer.encode() for the selected backend (cached, thread-safe)."""
+    backend = backend or get_backend()
+    return _cached(('embed', backend, name), _build_embedder, backend, name)
+
+
+def load_generator(backend=None, name=GEN_MODEL):
+    """(tokenizer, seq2seq model) for the selected backend (cached, thread-safe)."""
+    backend = backend or get_backend()
+    return _cached(('generate', backend, name), _build_generator, backend, name)
+
+
+def download(model_dir=None):
+    """Save both models (and their ONNX exports if optimum is installed) under model_dir for offline use."""
+    configure(model_dir=model_dir)
+    from sentence_transformers import SentenceTransformer
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+    SentenceTransformer(EMBED_MODEL).save(local_path(EMBED_MODEL))
+    AutoTokenizer.from_pretrained(GEN_MODEL).save_pretrained(local_path(GEN_MODEL))
+    AutoModelForSeq2SeqLM.from_pretrained(GEN_MODEL).save_pretrained(local_path(GEN_MODEL))
+    try:
+        load_embedder('onnx')
+        load_generator('onnx')
+    except ImportError as e:
+        print('Skipping ONNX export (optimum[onnxruntime] not installed):', e)
+    print('Models saved to', _CONFIG['model_dir'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--download', action='store_true', help='Save models locally so every backend can run offline')
+    parser.add_argument('--model_dir', default=None)
+    args = parser.parse_args()
+    if args.download:
+        download(args.model_dir)
+    else:
+        parser.print_help()
@@ -0,0 +1,254 @@
+"""loadtest.py
+Load generator for the query path. Replays questions.json (or a synthetic mix with a controlled
+repeat rate) against an in-process Retriever (+ optional generator) or an HTTP endpoint.
+Modes:
+- fixed concurrency (closed loop): --concurrency N workers each send the next request when the previous finishes
+- fixed rate (open loop): --rate QPS arrivals; latency is measured from the scheduled send time, so
+  queueing behind a saturated box shows up in the percentiles (at most --concurrency requests in flight)
+Records throughput, latency percentiles, error counts and RSS over time, and writes a JSON report
+(RSS is this process: the server itself for the in-process target, only the load generator with --url);
+--compare prints the change against a previous report (e.g. the last release).
+Usage:
+  python scripts/loadtest.py --indices indices --questions questions.json --concurrency 4 --duration 60
+  python scripts/loadtest.py --url http://localhost:8000/query --rate 20 --duration 60 --repeat_rate 0.3
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.request
+import numpy as np
+from inference import BACKENDS
+from profiling import peak_rss_mb, rss_mb
+
+
+def workload(questions, repeat_rate=None, seed=0):
+    """Endless question stream: plain replay (cycling) when repeat_rate is None, otherwise each request
+    repeats an already-issued question with probability repeat_rate and takes the next new one otherwise."""
+    rng = random.Random(seed)
+    issued = []
+    i = 0
+    while True:
+        if repeat_rate is not None and issued and rng.random() < repeat_rate:
+            yield rng.choice(issued)
+            continue
+        q = questions[i % len(questions)]
+        i += 1
+        if repeat_rate is not None:
+            issued.append(q)
+        yield q
+
+
+def in_process_target(indices, backend=None, generate=False, top_k=50, top_n=10, workers=4):
+    from inference import configure
+    from retrieve import Retriever
+    configure(backend=backend)
+    # one dense and one sparse worker per in-flight request, so the retriever's executors do not cap the load
+    retriever = Retriever(indices, background=False, max_workers=workers)
+    if generate:
+        from generate import generate_answer
+
+    def call(question):
+        fused = retriever.search(question, top_k=top_k, top_n=top_n)
+        if generate:
+            generate_answer(fused[:5], question)
+    return call
+
+
+def http_target(url, timeout=30.0):
+    def call(question):
+        body = json.dumps({'query': question}).encode()
+        req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+    return call
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = {}
+        self.completed = 0
+
+    def record(self, latency, error=None):
+        with self.lock:
+            self.completed += 1
+            if error is None:
+                self.latencies.append(latency)
+            else:
+                name = type(error).__name__
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def _sampler(recorder, stop, interval, timeline, t0):
+    last = 0
+    while not stop.wait(interval):
+        with recorder.lock:
+            done = recorder.completed
+            errors = sum(recorder.errors.values())
+        timeline.append({'t': time.time() - t0, 'qps': (done - last) / interval, 'completed': done,
+                         'errors': errors, 'rss_mb': rss_mb()})
+        last = done
+
+
+def _timed_call(call, question, recorder, scheduled):
+    try:
+        call(question)
+        recorder.record(time.time() - scheduled)
+    except Exception as e:
+        recorder.record(time.time() - scheduled, e)
+
+
+def run_concurrency(call, stream, recorder, concurrency, deadline, max_requests):
+    lock = threading.Lock()
+    sent = [0]
+
+    def worker():
+        while time.time() < deadline:
+            with lock:
+                if max_requests is not None and sent[0] >= max_requests:
+                    return
+                sent[0] += 1
+                question = next(stream)
+            _timed_call(call, question, recorder, time.time())
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def run_rate(call, stream, recorder, rate, concurrency, deadline, max_requests):
+    from concurrent.futures import ThreadPoolExecutor
+    interval = 1.0 / rate
+    sent = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        next_send = time.time()
+        while next_send < deadline and (max_requests is None or sent < max_requests):
+            delay = next_send - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(_timed_call, call, next(stream), recorder, next_send)
+            sent += 1
+            next_send += interval
+
+
+def summarize(recorder, elapsed):
+    lat = np.asarray(recorder.latencies) * 1000.0
+    total_errors = sum(recorder.errors.values())
+    out = {
+        'requests': recorder.completed,
+        'ok': len(lat),
+        'errors': total_errors,
+        'error_counts': recorder.errors,
+        'error_rate': total_errors / recorder.completed if recorder.completed else 0.0,
+        'elapsed_sec': elapsed,
+        'throughput_qps': len(lat) / elapsed if elapsed > 0 else 0.0,
+    }
+    if len(lat):
+        out['latency_ms'] = {'mean': float(lat.mean()), 'max': float(lat.max())}
+        for p in (50, 90, 95, 99):
+            out['latency_ms'][f'p{p}'] = float(np.percentile(lat, p))
+    return out
+
+
+def compare(current, previous):
+    """Relative change of headline numbers against a previous report."""
+    rows = [('throughput_qps', current['summary'].get('throughput_qps'), previous['summary'].get('throughput_qps'))]
+    for p in ('p50', 'p95', 'p99'):
+        rows.append((f'latency_{p}_ms', current['summary'].get('latency_ms', {}).get(p), previous['summary'].get('latency_ms', {}).get(p)))
+    rows.append(('error_rate', current['summary'].get('error_rate'), previous['summary'].get('error_rate')))
+    if current.get('rss_scope') == previous.get('rss_scope'):
+        # RSS of a load generator and of an in-process server are not comparable
+        rows.append(('peak_rss_mb', current.get('peak_rss_mb'), previous.get('peak_rss_mb')))
+    diff = {}
+    for name, cur, prev in rows:
+        if cur is None or prev is None:
+            continue
+        diff[name] = {'current': cur, 'previous': prev, 'change_pct': (cur - prev) / prev * 100.0 if prev else None}
+    return diff
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--questions', default='questions.json')
+    parser.add_argument('--indices', default='indices', help='In-process target: index directory')
+    parser.add_argument('--backend', choices=BACKENDS, default=None, help='In-process target: inference backend (see inference.py)')
+    parser.add_argument('--generate', action='store_true', help='In-process target: also generate an answer per request')
+    parser.add_argument('--retriever_workers', type=int, default=None, help='In-process target: Retriever workers per side (default: --concurrency)')
+    parser.add_argument('--url', default=None, help='HTTP target: POST {"query": ...} to this URL instead of running in-process')
+    parser.add_argument('--rate', type=float, default=None, help='Fixed arrival rate (QPS); default is fixed concurrency')
+    parser.add_argument('--concurrency', type=int, default=4, help='Workers (fixed concurrency) or max in-flight requests (fixed rate)')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to apply load')
+    parser.add_argument('--requests', type=int, default=None, help='Stop after this many requests')
+    parser.add_argument('--warmup', type=int, default=5, help='Unrecorded requests sent before the run')
+    parser.add_argument('--repeat_rate', type=float, default=None, help='Synthetic mix: probability a request repeats an earlier question')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sample_interval', type=float, default=1.0, help='Seconds between throughput / RSS samples')
+    parser.add_argument('--out', default='loadtest_report.json')
+    parser.add_argument('--compare', default=None, help='Previous loadtest report to compare against')
+    args = parser.parse_args()
+
+    with open(args.questions) as f:
+        questions = [q['question'] for q in json.load(f)]
+    if not questions:
+        raise SystemExit('No questions to replay')
+
+    if args.url:
+        call = http_target(args.url)
+    else:
+        print('Loading retriever from', args.indices)
+        call = in_process_target(args.indices, backend=args.backend, generate=args.generate,
+                                 workers=args.retriever_workers or args.concurrency)
+    stream = workload(questions, repeat_rate=args.repeat_rate, seed=args.seed)
+    for q in questions[:args.warmup]:
+        try:
+            call(q)
+        except Exception as e:
+            print('warmup-error', e)
+
+    recorder = Recorder()
+    timeline = []
+    stop = threading.Event()
+    rss_start = rss_mb()
+    t0 = time.time()
+    sampler = threading.Thread(target=_sampler, args=(recorder, stop, args.sample_interval, timeline, t0), daemon=True)
+    sampler.start()
+    deadline = t0 + args.duration
+    if args.rate:
+        run_rate(call, stream, recorder, args.rate, args.concurrency, deadline, args.requests)
+    else:
+        run_concurrency(call, stream, recorder, args.concurrency, deadline, args.requests)
+    elapsed = time.time() - t0
+    stop.set()
+    sampler.join()
+
+    report = {
+        'config': {k: v for k, v in vars(args).items() if k not in ('out', 'compare')},
+        'target': args.url or 'in-process',
+        'mode': 'rate' if args.rate else 'concurrency',
+        'summary': summarize(recorder, elapsed),
+        'rss_scope': 'load generator process only (HTTP server not measured)' if args.url else 'in-process server',
+        'rss_start_mb': rss_start,
+        'peak_rss_mb': peak_rss_mb(),
+        'timeline': timeline,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            report['comparison'] = compare(report, json.load(f))
+
+    s = report['summary']
+    print(f"{s['ok']} ok / {s['errors']} errors in {s['elapsed_sec']:.1f}s -> {s['throughput_qps']:.2f} QPS")
+    if 'latency_ms' in s:
+        lat = s['latency_ms']
+        print(f"latency ms: p50 {lat['p50']:.1f}  p90 {lat['p90']:.1f}  p95 {lat['p95']:.1f}  p99 {lat['p99']:.1f}  max {lat['max']:.1f}")
+    print(f"peak RSS {report['peak_rss_mb']:.0f} MB ({report['rss_scope']})")
+    for name, d in report.get('comparison', {}).items():
+        change = f"{d['change_pct']:+.1f}%" if d['change_pct'] is not None else 'n/a'
+        print(f"{name:18s} {d['previous']:.3f} -> {d['current']:.3f} ({change})")
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Wrote loadtest report to', args.out)
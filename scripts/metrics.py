@@ -0,0 +1,145 @@
+"""metrics.py
+Vectorized evaluation metrics for the Hybrid RAG pipeline.
+- relevance_matrix(ground_urls, ranked_urls_list, depth): questions x ranks 0/1 matrix (URL level)
+- ranking_metrics(rel, ks): MRR plus Precision@k, Recall@k and NDCG@k for every k in one pass
+- token_f1(a, b): token-level F1 between two strings (fallback answer metric)
+- SemanticScorer: batched BERTScore F1 with a cached scoring model, falling back to token-F1
+"""
+import numpy as np
+
+DEFAULT_KS = (1, 3, 5, 10, 20)
+
+# BERTScorer instances keyed by configuration so repeated evaluations reuse the loaded model
+_SCORER_CACHE = {}
+
+
+def relevance_matrix(ground_urls, ranked_urls_list, depth=None):
+    """Build a (num_questions x depth) binary relevance matrix.
+    rel[i, j] = 1 if the URL retrieved at rank j+1 for question i equals that question's ground URL.
+    A ranked entry may also be a list of URLs (a deduplicated chunk); it is relevant if it contains the ground URL.
+    Rows shorter than depth are padded with zeros.
+    """
+    if depth is None:
+        depth = max((len(r) for r in ranked_urls_list), default=0)
+    rel = np.zeros((len(ground_urls), depth), dtype=np.float64)
+    for i, (ground, ranked) in enumerate(zip(ground_urls, ranked_urls_list)):
+        ranked = ranked[:depth]
+        if ranked and all(isinstance(u, str) for u in ranked):
+            rel[i, :len(ranked)] = np.asarray(ranked, dtype=object) == ground
+        else:
+            rel[i, :len(ranked)] = [ground == u if isinstance(u, str) else ground in u for u in ranked]
+    return rel
+
+
+def ranking_metrics(rel, ks=DEFAULT_KS):
+    """Compute per-question retrieval metrics from a relevance matrix.
+    Returns a dict of 1-D arrays (one value per question):
+    - 'mrr': 1/r for the first relevant rank r (0 if none)
+    - 'precision@k': fraction of the top-k ranks that are relevant
+    - 'recall@k': 1 if the ground URL appears in the top-k (a single relevant URL per question)
+    - 'ndcg@k': binary-relevance DCG@k normalised by the ideal DCG@k of the same row
+    - 'dcg@k': binary-relevance DCG@k with IDCG = 1 (the original report's NDCG@10 definition, which
+      assumes a single relevant rank; it can exceed 1 when several chunks of the ground URL are retrieved)
+    """
+    rel = np.asarray(rel, dtype=np.float64)
+    num_q, depth = rel.shape
+    out = {}
+    hit = rel > 0
+    first = np.argmax(hit, axis=1) if depth else np.zeros(num_q, dtype=int)
+    any_hit = hit.any(axis=1)
+    out['mrr'] = np.where(any_hit, 1.0 / (first + 1), 0.0)
+
+    discounts = 1.0 / np.log2(np.arange(2, depth + 2))
+    gains = (2.0 ** rel - 1.0) * discounts
+    dcg_cum = np.cumsum(gains, axis=1)
+    # ideal ordering puts every relevant rank first
+    ideal = -np.sort(-rel, axis=1)
+    idcg_cum = np.cumsum((2.0 ** ideal - 1.0) * discounts, axis=1)
+    hits_cum = np.cumsum(rel, axis=1)
+
+    for k in ks:
+        kk = min(k, depth)
+        if kk == 0:
+            zeros = np.zeros(num_q)
+            out[f'precision@{k}'] = zeros
+            out[f'recall@{k}'] = zeros
+            out[f'ndcg@{k}'] = zeros
+            out[f'dcg@{k}'] = zeros
+            continue
+        out[f'precision@{k}'] = hits_cum[:, kk - 1] / k
+        out[f'recall@{k}'] = (hits_cum[:, kk - 1] > 0).astype(np.float64)
+        idcg = idcg_cum[:, kk - 1]
+        out[f'ndcg@{k}'] = np.divide(dcg_cum[:, kk - 1], idcg, out=np.zeros(num_q), where=idcg > 0)
+        out[f'dcg@{k}'] = dcg_cum[:, kk - 1]
+    return out
+
+
+def summarize(per_question):
+    """Mean of every per-question metric array."""
+    return {name: float(np.mean(vals)) if len(vals) else 0.0 for name, vals in per_question.items()}
+
+
+def token_f1(a, b):
+    atok = (a or '').lower().split()
+    btok = (b or '').lower().split()
+    if not atok or not btok:
+        return 0.0
+    common = 0
+    bcounts = {}
+    for t in btok:
+        bcounts[t] = bcounts.get(t, 0) + 1
+    for t in atok:
+        if bcounts.get(t, 0) > 0:
+            common += 1
+            bcounts[t] -= 1
+    prec = common / len(atok)
+    rec = common / len(btok)
+    if prec + rec == 0:
+        return 0.0
+    return 2 * prec * rec / (prec + rec)
+
+
+class SemanticScorer:
+    """Semantic answer similarity between generated and reference answers.
+    Uses BERTScore F1 (scored in batches of batch_size on the given device) when bert-score
+    is installed, otherwise token-level F1. The BERTScore model is loaded once per
+    configuration and shared by every SemanticScorer in the process.
+    """
+
+    def __init__(self, batch_size=64, device=None, lang='en', model_type=None, rescale_with_baseline=True, use_bertscore=True):
+        self.batch_size = batch_size
+        self.device = device
+        self.lang = lang
+        self.model_type = model_type
+        self.rescale_with_baseline = rescale_with_baseline
+        self.use_bertscore = use_bertscore
+        self.method = None
+
+    def _bertscorer(self):
+        key = (self.lang, self.model_type, self.device, self.rescale_with_baseline)
+        if key not in _SCORER_CACHE:
+            from bert_score import BERTScorer
+            _SCORER_CACHE[key] = BERTScorer(lang=self.lang, model_type=self.model_type, device=self.device,
+                                            batch_size=self.batch_size, rescale_with_baseline=self.rescale_with_baseline)
+        return _SCORER_CACHE[key]
+
+    def score(self, preds, refs):
+        """Return a per-pair score array aligned with preds/refs."""
+        preds = [p or '' for p in preds]
+        refs = [r or '' for r in refs]
+        if not preds:
+            return np.zeros(0)
+        if self.use_bertscore:
+            try:
+                scorer = self._bertscorer()
+                f1s = []
+                for start in range(0, len(preds), self.batch_size):
+                    _, _, F1 = scorer.score(preds[start:start + self.batch_size], refs[start:start + self.batch_size],
+                                            batch_size=self.batch_size)
+                    f1s.append(F1.cpu().numpy())
+                self.method = 'bertscore'
+                return np.concatenate(f1s).astype(np.float64)
+            except Exception as e:
+                print('bert-score-error', e)
+        self.method = 'token_f1'
+        return np.array([token_f1(p, r) for p, r in zip(preds, refs)], dtype=np.float64)
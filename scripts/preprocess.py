@@ -1,6 +1,6 @@
 """preprocess.py
 Cleans raw text and chunks documents into 200-400 token chunks with 50-token overlap.
-Outputs chunks JSON with metadata: chunk_id, url, title, text, start_word, end_word
+Outputs chunks JSON with metadata: chunk_id, url, title, subset, text, start_word, end_word
 """
 import argparse
 import json
@@ -52,6 +52,7 @@ if __name__ == '__main__':
                 'chunk_id': chunk_id,
                 'url': d['url'],
                 'title': d.get('title',''),
+                'subset': d.get('subset'),
                 'text': c['text'],
                 'start_word': c['start_word'],
                 'end_word': c['end_word']
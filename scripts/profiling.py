@@ -0,0 +1,28 @@
+"""profiling.py
+Process memory helpers shared by the benchmark and load-testing scripts.
+- rss_mb(): current resident set size of this process in MiB (None if it cannot be read)
+- peak_rss_mb(): peak resident set size of this process so far in MiB
+"""
+import os
+import resource
+import sys
+
+
+def rss_mb():
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss / 2**20
+    except ImportError:
+        pass
+    try:
+        # Linux without psutil: second field of statm is resident pages
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
@@ -4,40 +4,139 @@ Functions:
 - dense_search(query, top_k)
 - sparse_search(query, top_k)
 - rrf_fuse(list_of_ranked_lists, k=60, top_n=10)
+- search(query, top_k, top_n, timeout) / asearch(...): dense and sparse run concurrently, then RRF fusion
+Index files and the embedding model load in background threads when the Retriever is created;
+each component is waited for only when first used, so BM25-only queries work before the dense model is ready.
+faiss is imported on first use.
+Every search accepts filters={'url': [...], 'title': [...], 'subset': 'fixed'|'random'}; they are resolved to
+precomputed row bitsets (filters.py) applied inside FAISS (IDSelectorBitmap) and BM25 scoring,
+so restricted queries score only matching rows and still return top_k matches when that many exist.
 """
+import asyncio
 import os
 import joblib
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
 import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from inference import EMBED_MODEL, load_embedder
+import filters as filter_bits
 
-MODEL_NAME = 'all-MiniLM-L6-v2'
+MODEL_NAME = EMBED_MODEL
 
 class Retriever:
-    def __init__(self, index_dir='indices'):
+    def __init__(self, index_dir='indices', backend=None, max_workers=2, background=True):
         self.index_dir = index_dir
-        self.index = faiss.read_index(os.path.join(index_dir, 'faiss_index.index'))
-        self.meta = joblib.load(os.path.join(index_dir, 'meta.joblib'))
-        self.bm25 = joblib.load(os.path.join(index_dir, 'bm25.joblib'))
-        self.model = SentenceTransformer(MODEL_NAME)
-        self.ids = self.meta['ids']
-        self.chunks = self.meta['chunks']
-        
-
-    def dense_search(self, query, top_k=10):
+        self.backend = backend
+        # one executor per side, shared by every search() call: max_workers concurrent queries per side,
+        # and dense work abandoned after a timeout can never starve the sparse side
+        self.dense_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='retriever-dense')
+        self.sparse_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='retriever-sparse')
+        # separate loader threads so component loading never queues behind (or blocks) queries
+        self._loader = ThreadPoolExecutor(max_workers=5, thread_name_prefix='retriever-load')
+        # submitted in the order queries need them: sparse search needs only meta + bm25
+        self._loading = {}
+        self._loading['meta'] = self._loader.submit(joblib.load, os.path.join(index_dir, 'meta.joblib'))
+        self._loading['bm25'] = self._loader.submit(joblib.load, os.path.join(index_dir, 'bm25.joblib'))
+        self._loading['index'] = self._loader.submit(self._read_index)
+        self._loading['model'] = self._loader.submit(load_embedder, backend, MODEL_NAME)
+        self._loading['filters'] = self._loader.submit(self._load_filters, self._loading['meta'])
+        # resolved filter bitsets keyed by the normalised filter spec
+        self._mask_cache = {}
+        self._loader.shutdown(wait=False)
+        if not background:
+            self.wait_ready()
+
+    def _read_index(self):
+        import faiss
+        return faiss.read_index(os.path.join(self.index_dir, 'faiss_index.index'))
+
+    def _load_filters(self, meta_future):
+        path = os.path.join(self.index_dir, 'filters.joblib')
+        if os.path.exists(path):
+            return joblib.load(path)
+        # indices built before filters.joblib existed: build the bitsets from the chunk metadata
+        return filter_bits.build_filters(meta_future.result()['chunks'])
+
+    def is_ready(self, component=None):
+        """True once the given component ('meta', 'bm25', 'index', 'model', 'filters'), or all of them, has loaded.
+        A component whose loading failed is never ready; accessing it re-raises the loading error."""
+        futures = self._loading.values() if component is None else [self._loading[component]]
+        return all(f.done() and f.exception() is None for f in futures)
+
+    def _dense_ready(self):
+        return self.is_ready('model') and self.is_ready('index')
+
+    def wait_ready(self, timeout=None):
+        wait(list(self._loading.values()), timeout=timeout)
+        return self.is_ready()
+
+    @property
+    def meta(self):
+        return self._loading['meta'].result()
+
+    @property
+    def ids(self):
+        return self.meta['ids']
+
+    @property
+    def chunks(self):
+        return self.meta['chunks']
+
+    @property
+    def bm25(self):
+        return self._loading['bm25'].result()
+
+    @property
+    def index(self):
+        return self._loading['index'].result()
+
+    @property
+    def model(self):
+        return self._loading['model'].result()
+
+    @property
+    def filters(self):
+        return self._loading['filters'].result()
+
+    def filter_bitset(self, filters):
+        """Packed row bitset for a filter spec (None when unfiltered), cached per spec."""
+        if not filters:
+            return None
+        key = tuple(sorted((f, tuple(sorted([v] if isinstance(v, str) else v))) for f, v in filters.items()))
+        # dense and sparse threads call this concurrently: only ever return the local reference
+        bits = self._mask_cache.get(key)
+        if bits is None:
+            bits = filter_bits.combine(self.filters, filters)
+            if len(self._mask_cache) >= 256:
+                self._mask_cache.clear()
+            self._mask_cache[key] = bits
+        return bits
+
+    def dense_search(self, query, top_k=10, filters=None):
+        import faiss
+        bits = self.filter_bitset(filters)
         q_emb = self.model.encode([query], convert_to_numpy=True)
         faiss.normalize_L2(q_emb)
-        D, I = self.index.search(q_emb, top_k)
+        if bits is None:
+            D, I = self.index.search(q_emb, top_k)
+        else:
+            if not bits.any():
+                return []
+            # the Python wrapper passes the bitmap length in bytes and keeps `bits` referenced
+            sel = faiss.IDSelectorBitmap(bits)
+            D, I = self.index.search(q_emb, top_k, params=faiss.SearchParameters(sel=sel))
         results = []
         for rank, idx in enumerate(I[0]):
+            if idx < 0:
+                # fewer than top_k rows (matching the filter) in the index
+                break
             chunk_id = self.ids[idx]
             score = float(D[0][rank])
             results.append({'chunk_id': chunk_id, 'score': score, 'rank': rank+1})
         return results
     
 
-    def sparse_search(self, query, top_k=10):
+    def sparse_search(self, query, top_k=10, filters=None):
         # Minimal token normalization to match build_index.py: lowercase and remove punctuation
         def normalize(text):
             if not isinstance(text, str):
@@ -48,12 +147,22 @@ class Retriever:
             return txt
 
         tokens = normalize(query).split()
-        # bm25.get_scores returns a list of scores aligned with the corpus order
-        scores = np.array(self.bm25.get_scores(tokens))
+        bits = self.filter_bitset(filters)
+        if bits is None:
+            # bm25.get_scores returns a list of scores aligned with the corpus order
+            rows = None
+            scores = np.array(self.bm25.get_scores(tokens))
+        else:
+            # score only the rows allowed by the filter
+            rows = np.flatnonzero(filter_bits.unpack(bits, self.filters['n']))
+            scores = np.array(self.bm25.get_batch_scores(tokens, rows.tolist())) if rows.size else np.zeros(0)
         if scores.size == 0:
             return []
         # get top_k indices (descending)
         topk_idx = np.argsort(scores)[-top_k:][::-1]
+        if rows is not None:
+            scores = dict(zip(rows[topk_idx], scores[topk_idx]))
+            topk_idx = rows[topk_idx]
         results = []
         rank = 1
         for idx in topk_idx:
@@ -101,18 +210,82 @@ class Retriever:
                 'dense_rank': dense_ranks.get(cid, 'NA'),
                 'sparse_rank': sparse_ranks.get(cid, 'NA'),
                 'text': chunk['text'] if chunk else '',
-                'url': chunk['url'] if chunk else ''
+                'url': chunk['url'] if chunk else '',
+                # deduplicated chunks stand for every URL in their near-duplicate group
+                'urls': chunk.get('urls', [chunk['url']]) if chunk else []
             })
 
         return fused
 
+    def _collect(self, dense_f, sparse_f, pending, require_dense=True):
+        # drop timed-out work that has not started yet; a running encode or BM25 scoring pass
+        # cannot be interrupted and finishes in the background, holding its worker until then
+        for f in pending:
+            f.cancel()
+        timed_out = [name for name, f in (('dense', dense_f), ('sparse', sparse_f)) if f in pending]
+        dense = []
+        if 'dense' not in timed_out:
+            if require_dense or dense_f.exception() is None:
+                dense = dense_f.result()
+            else:
+                # dense side failed (e.g. the embedding model could not load): answer from BM25 alone
+                print('dense-search-error', dense_f.exception())
+                timed_out.append('dense')
+        sparse = sparse_f.result() if 'sparse' not in timed_out else []
+        return {'dense': dense, 'sparse': sparse, 'timed_out': timed_out}
+
+    def search(self, query, top_k=50, top_n=10, rrf_k=60, timeout=None, return_components=False, require_dense=True, filters=None):
+        """
+        Hybrid search: dense and sparse retrieval run concurrently on their shared executors and are
+        fused with RRF as soon as both finish. If timeout (seconds) expires first, the side(s)
+        that already finished are fused (waiting for the first one if neither has); the late side is
+        cancelled if still queued, but an already running encode cannot be interrupted.
+        Returns the fused list, or a dict with 'fused', 'dense', 'sparse' and 'timed_out'
+        (names of the sides left out) when return_components is True.
+        With require_dense=False, queries arriving before the dense side has loaded, or after it failed to
+        load or search, are answered by BM25 alone.
+        filters restrict both sides to matching chunk rows (see filters.py).
+        """
+        if not require_dense and not self._dense_ready():
+            out = {'dense': [], 'sparse': self.sparse_search(query, top_k, filters), 'timed_out': ['dense']}
+            out['fused'] = self.rrf_fuse(out['dense'], out['sparse'], rrf_k=rrf_k, top_n=top_n)
+            return out if return_components else out['fused']
+        dense_f = self.dense_pool.submit(self.dense_search, query, top_k, filters)
+        sparse_f = self.sparse_pool.submit(self.sparse_search, query, top_k, filters)
+        done, pending = wait([dense_f, sparse_f], timeout=timeout)
+        if len(done) == 0:
+            done, pending = wait([dense_f, sparse_f], return_when=FIRST_COMPLETED)
+        out = self._collect(dense_f, sparse_f, pending, require_dense=require_dense)
+        out['fused'] = self.rrf_fuse(out['dense'], out['sparse'], rrf_k=rrf_k, top_n=top_n)
+        return out if return_components else out['fused']
+
+    async def asearch(self, query, top_k=50, top_n=10, rrf_k=60, timeout=None, return_components=False, require_dense=True, filters=None):
+        """Event-loop variant of search() with the same arguments; the loop is not blocked while both sides
+        run on their executors."""
+        loop = asyncio.get_running_loop()
+        if not require_dense and not self._dense_ready():
+            sparse = await loop.run_in_executor(self.sparse_pool, self.sparse_search, query, top_k, filters)
+            out = {'dense': [], 'sparse': sparse, 'timed_out': ['dense']}
+            out['fused'] = self.rrf_fuse(out['dense'], out['sparse'], rrf_k=rrf_k, top_n=top_n)
+            return out if return_components else out['fused']
+        dense_f = loop.run_in_executor(self.dense_pool, self.dense_search, query, top_k, filters)
+        sparse_f = loop.run_in_executor(self.sparse_pool, self.sparse_search, query, top_k, filters)
+        done, pending = await asyncio.wait([dense_f, sparse_f], timeout=timeout)
+        if len(done) == 0:
+            done, pending = await asyncio.wait([dense_f, sparse_f], return_when=asyncio.FIRST_COMPLETED)
+        out = self._collect(dense_f, sparse_f, pending, require_dense=require_dense)
+        out['fused'] = self.rrf_fuse(out['dense'], out['sparse'], rrf_k=rrf_k, top_n=top_n)
+        return out if return_components else out['fused']
+
+    def close(self):
+        self.dense_pool.shutdown(wait=False, cancel_futures=True)
+        self.sparse_pool.shutdown(wait=False, cancel_futures=True)
+
 
 if __name__ == '__main__':
     # example usage
     r = Retriever('indices')
     q = 'What is the main idea of natural language processing?'
-    d = r.dense_search(q, top_k=20)
-    s = r.sparse_search(q, top_k=20)
-    fused = r.rrf_fuse(d, s, rrf_k=60, top_n=10)
+    fused = r.search(q, top_k=20, top_n=10)
     print('Fused top:', fused[:3])
 